@@ -2,17 +2,26 @@
 Merge menu_mix_daily_aggregated.csv with MenuItemMasterName_0.xlsx
 - Replace ItemName with master "Item Name"
 - Add Product Class, Revenue Category, and Item Group
-- Save enriched data to Excel and CSV
+- Save enriched data to Excel, CSV, and Parquet
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import xlsxwriter
 from pathlib import Path
 
+def _int_item_id(ids: pd.Series) -> pd.Series:
+    """Integer version of canonical numeric IDs ("0", "101", no leading zeros); <NA> otherwise."""
+    canonical = ids.str.fullmatch(r"(?:0|[1-9]\d{0,17})").fillna(False).astype(bool)
+    return ids.where(canonical).astype("int64[pyarrow]").astype("Int64")
+
 def main(
     mix_csv_path=r"C:\Users\cshelton.BEAVERRUN\OneDrive - Beaver Run Resort\Desktop\Python Projects\Menu_Mixes\menu_mix_daily_aggregated.csv",
     master_xlsx_path=r"C:\Users\cshelton.BEAVERRUN\OneDrive - Beaver Run Resort\Desktop\Python Projects\24-25 Electronic Journals\MenuItemMasterName_0.xlsx",
     out_xlsx_path="menu_mix_daily_enriched.xlsx",
     out_csv_path="menu_mix_daily_enriched.csv",
+    out_parquet_path="menu_mix_daily_enriched.parquet",
 ):
     # --- Load the menu mix (keep everything as string to avoid ID mismatches) ---
     df_mix = pd.read_csv(mix_csv_path, dtype=str)
@@ -27,8 +36,8 @@ def main(
     if "ItemID" not in df_mix.columns:
         raise ValueError("Could not find 'ItemID' (or 'Item ID') in the menu mix CSV.")
 
-    # Clean ItemID values
-    df_mix["ItemID"] = df_mix["ItemID"].astype(str).str.strip()
+    # Clean ItemID values (Arrow-backed strings: strip runs as utf8_trim_whitespace)
+    df_mix["ItemID"] = df_mix["ItemID"].astype("string[pyarrow]").str.strip()
 
     # --- Load master Excel with messy header ---
     # Row 7 is the header (0-indexed header=6) and we only need specific columns:
@@ -38,7 +47,7 @@ def main(
         header=6,
         usecols="A,C,D,J,L",
         dtype=str,
-        engine="openpyxl",
+        engine="calamine",
     )
 
     # Standardize column names
@@ -62,10 +71,23 @@ def main(
 
     # Clean/prepare master keys
     df_master = df_master.dropna(subset=["ItemID"])
-    df_master["ItemID"] = df_master["ItemID"].astype(str).str.strip()
+    df_master["ItemID"] = df_master["ItemID"].astype("string[pyarrow]").str.strip()
 
     # --- Merge (left join to keep all rows from the menu mix) ---
-    df_out = df_mix.merge(df_master, on="ItemID", how="left")
+    # Canonical numeric IDs join on an Int64 key (integer hashing instead of string
+    # hashing); since int equality == string equality for those, any other IDs can
+    # keep joining on the string key without changing which rows match.
+    df_mix["ItemID_int"] = _int_item_id(df_mix["ItemID"])
+    df_master["ItemID_int"] = _int_item_id(df_master["ItemID"])
+    df_mix["_row"] = range(len(df_mix))  # restores menu mix row order after the split
+    mix_num = df_mix["ItemID_int"].notna()
+    master_num = df_master["ItemID_int"].notna()
+    df_out = df_mix[mix_num].merge(df_master[master_num].drop(columns="ItemID"), on="ItemID_int", how="left")
+    if not mix_num.all():
+        df_str = df_mix[~mix_num].merge(df_master[~master_num].drop(columns="ItemID_int"), on="ItemID", how="left")
+        df_out = pd.concat([df_out, df_str], ignore_index=True)
+        df_out = df_out.sort_values("_row", kind="stable").reset_index(drop=True)
+    df_out = df_out.drop(columns=["ItemID_int", "_row"])
 
     # Replace or create ItemName using master "Item Name"
     if "Item Name" in df_out.columns:
@@ -88,8 +110,32 @@ def main(
         df_out = df_out[cols]
 
     # --- Save outputs ---
-    df_out.to_excel(out_xlsx_path, index=False)
-    df_out.to_csv(out_csv_path, index=False, encoding="utf-8-sig")
+    # xlsxwriter's constant_memory mode streams each finished row to disk instead of
+    # holding the sheet in RAM. It only accepts rows in order, and pandas' to_excel
+    # writes column by column, so the rows are written directly.
+    max_rows, max_cols = 1048576, 16384  # Excel sheet limits; write_row would just skip past them
+    if len(df_out) + 1 > max_rows or len(df_out.columns) > max_cols:
+        raise ValueError(
+            f"This sheet is too large! Your sheet size is: {len(df_out) + 1}, {len(df_out.columns)} "
+            f"Max sheet size is: {max_rows}, {max_cols}"
+        )
+    wb = xlsxwriter.Workbook(out_xlsx_path, {"constant_memory": True})
+    ws = wb.add_worksheet()
+    ws.write_row(0, 0, list(df_out.columns), wb.add_format({"bold": True, "border": 1, "align": "center"}))
+    for i, row in enumerate(df_out.itertuples(index=False, name=None), start=1):
+        ws.write_row(i, 0, [None if pd.isna(v) else v for v in row])  # blank cells for NaN/NA
+    wb.close()
+    with open(out_csv_path, "wb") as f:
+        f.write(b"\xef\xbb\xbf")  # UTF-8 BOM (same as utf-8-sig) so Excel detects the encoding
+        pacsv.write_csv(pa.Table.from_pandas(df_out, preserve_index=False), f)
+    # Parquet is the dashboard's fast path, so store real types there (ItemID stays text)
+    typed = {}
+    if "BusinessDate" in df_out.columns:
+        typed["BusinessDate"] = pd.to_datetime(df_out["BusinessDate"], errors="coerce")
+    for m in ["ItemsSold", "NetRevenue", "AvgNetPrice"]:
+        if m in df_out.columns:
+            typed[m] = pd.to_numeric(df_out[m], errors="coerce")
+    df_out.assign(**typed).to_parquet(out_parquet_path, engine="pyarrow", compression="zstd", index=False)
 
     # Basic diagnostics
     matched = df_out["ItemName"].notna().sum() if "ItemName" in df_out.columns else 0
@@ -3,22 +3,47 @@ import os
 import io
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import plotly.express as px
 import streamlit as st
 
 st.set_page_config(page_title="Menu Mix Dashboard", layout="wide")
 
 # ---------- Data loading & feature engineering ----------
+TEXT_COLS = ["ProfitCenterName", "Product Class", "Revenue Category", "Item Group", "ItemName"]
+CATEGORY_COLS = TEXT_COLS + ["SkiSeason"]
+ORDERED_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+# every metric is summed (KPIs and aggregate), and multi-season totals pass 2**24 (~1.6e7),
+# where a float32 accumulator loses whole units; so all metrics stay float64
+METRIC_DTYPES = {"ItemsSold": "float64", "NetRevenue": "float64", "AvgNetPrice": "float64"}
+TIME_KEYS = {"Month": "Month", "Week": "WeekStart", "Day of Week": "DayOfWeek", "Ski Season": "SkiSeason"}
+TEXT_DTYPES = {c: "string[pyarrow]" for c in TEXT_COLS}
+
 @st.cache_data
 def load_data(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)  # read CSV
-    df["BusinessDate"] = pd.to_datetime(df["BusinessDate"], errors="coerce")  # parse date
+    if str(getattr(path, "name", path)).endswith(".parquet"):
+        df = pd.read_parquet(path, engine="pyarrow")  # columnar file, no text parsing
+    else:
+        df = pd.read_csv(path, engine="pyarrow")  # read CSV (Arrow parser)
+    df = df.astype({c: t for c, t in TEXT_DTYPES.items() if c in df.columns})  # Arrow-backed text
+    if not pd.api.types.is_datetime64_any_dtype(df["BusinessDate"]):  # typed Parquet skips this
+        df["BusinessDate"] = pd.to_datetime(df["BusinessDate"], errors="coerce")  # parse date
     df = df.dropna(subset=["BusinessDate"]).copy()  # keep rows with valid dates
 
-    # clean text fields
-    for c in ["ProfitCenterName", "Product Class", "Revenue Category", "Item Group", "ItemName"]:
+    # numeric cast (tolerant: stray cells like "$4.00" become NaN instead of failing the load);
+    # columns that already arrive numeric only get the width cast
+    for m, dtype in METRIC_DTYPES.items():
+        if m in df.columns:
+            if not pd.api.types.is_numeric_dtype(df[m]):
+                df[m] = pd.to_numeric(df[m], errors="coerce")
+            df[m] = df[m].astype(dtype)
+
+    # clean text fields (Arrow-backed strings, so strip runs in Arrow compute)
+    for c in TEXT_COLS:
         if c in df.columns:
-            df[c] = df[c].astype(str).str.strip()
+            df[c] = df[c].str.strip()
 
     # time features
     df["Year"] = df["BusinessDate"].dt.year
@@ -26,98 +51,135 @@ def load_data(path: str) -> pd.DataFrame:
     iso = df["BusinessDate"].dt.isocalendar()
     df["ISO_Year"] = iso["year"].astype(int)
     df["ISO_Week"] = iso["week"].astype(int)
-    df["WeekLabel"] = df["ISO_Year"].astype(str) + "-W" + df["ISO_Week"].astype(str).str.zfill(2)
     df["WeekStart"] = df["BusinessDate"] - pd.to_timedelta(df["BusinessDate"].dt.weekday, unit="D")
-    df["DayOfWeek"] = df["BusinessDate"].dt.day_name()
-
-    # Ski Season: Nov 10 → Apr 20 (cross-year)
-    def ski_season_label(d):
-        m, day, y = d.month, d.day, d.year
-        if (m > 11) or (m == 11 and day >= 10) or (m == 12):
-            start_year = y
-        elif (m < 4) or (m == 4 and day <= 20):
-            start_year = y - 1
-        else:
-            return None  # off-season
-        start = pd.Timestamp(year=start_year, month=11, day=10)
-        end = pd.Timestamp(year=start_year + 1, month=4, day=20)
-        return f"{start_year}-{start_year+1}" if (d >= start) and (d <= end) else None
-
-    df["SkiSeason"] = df["BusinessDate"].apply(ski_season_label)
-    df["InSkiSeason"] = df["SkiSeason"].notna()
-
-    # numeric cast
-    for m in ["ItemsSold", "NetRevenue", "AvgNetPrice"]:
-        if m in df.columns:
-            df[m] = pd.to_numeric(df[m], errors="coerce")
+    df["DayOfWeek"] = pd.Categorical(df["BusinessDate"].dt.day_name(), categories=ORDERED_DAYS, ordered=True)
+
+    # Ski Season: Nov 10 → Apr 20 (cross-year), labelled once per distinct date and
+    # broadcast back to the rows through the factorize codes
+    codes, dates = pd.factorize(df["BusinessDate"])
+    m = dates.month.to_numpy()
+    d = dates.day.to_numpy()
+    y = dates.year.to_numpy()
+    late = (m >= 11) & ~((m == 11) & (d < 10))   # Nov 10 → Dec 31
+    early = (m < 4) | ((m == 4) & (d <= 20))     # Jan 1 → Apr 20
+    in_season = late | early
+    start_year = np.where(late, y, y - 1)
+    labels = np.char.add(np.char.add(start_year.astype(str), "-"), (start_year + 1).astype(str))
+    df["SkiSeason"] = pd.Series(np.where(in_season, labels, None)[codes], index=df.index)
+    df["InSkiSeason"] = in_season[codes]
+
+    # low-cardinality labels as categoricals: cheap unique()/isin() on integer codes
+    for c in CATEGORY_COLS:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
     return df
 
-def filter_df(df: pd.DataFrame, filters: dict, date_range):
-    q = df.copy()
+def date_bounds(df: pd.DataFrame):
+    return df["BusinessDate"].min().date(), df["BusinessDate"].max().date()
+
+def filter_df(df: pd.DataFrame, filters: dict, date_range, bounds=None, columns=None):
+    # columns: optional projection applied in the same take as the row mask
+    if df.empty:
+        return df if columns is None else df[columns]
+    start, end = date_range if date_range is not None else (None, None)
+    min_date, max_date = bounds if bounds is not None else date_bounds(df)
+    if not any(filters.values()) and (start is None or start <= min_date) and (end is None or end >= max_date):
+        return df if columns is None else df[columns]  # nothing filtered out: skip the mask
+
+    # build one combined mask and subset once (no intermediate frames)
+    mask = np.ones(len(df), dtype=bool)
     for col, values in filters.items():
         if values:
-            q = q[q[col].isin(values)]
+            mask &= df[col].isin(values).to_numpy()
     if date_range is not None:
-        start, end = date_range
+        bd = df["BusinessDate"].to_numpy()
         if start is not None:
-            q = q[q["BusinessDate"] >= pd.to_datetime(start)]
+            mask &= bd >= np.datetime64(start)
         if end is not None:
-            q = q[q["BusinessDate"] <= pd.to_datetime(end)]
-    return q
+            mask &= bd <= np.datetime64(end)
+    return df.loc[mask] if columns is None else df.loc[mask, columns]
+
+@st.cache_data
+def cached_date_bounds(_df: pd.DataFrame, data_key: str):
+    return date_bounds(_df)
+
+@st.cache_data
+def cached_options(_df: pd.DataFrame, data_key: str, col: str):
+    return sorted(_df[col].cat.categories.tolist(), key=lambda x: str(x))
 
 def aggregate(q: pd.DataFrame, time_slice: str, compare_by: str, metric: str):
-    if time_slice == "Month":
-        time_key, sort_col = "Month", "Month"
-    elif time_slice == "Week":
-        time_key, sort_col = "WeekStart", "WeekStart"
-    elif time_slice == "Day of Week":
-        time_key, sort_col = "DayOfWeek", "DayOfWeek"
-        ordered_days = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
-        q["DayOfWeek"] = pd.Categorical(q["DayOfWeek"], categories=ordered_days, ordered=True)
-    elif time_slice == "Ski Season":
-        time_key, sort_col = "SkiSeason", "SkiSeason"
-        q = q[q["SkiSeason"].notna()].copy()
-    else:
-        time_key, sort_col = "Month", "Month"
+    time_key = TIME_KEYS.get(time_slice, "Month")
+    if time_key == "SkiSeason":
+        q = q[q["SkiSeason"].notna()]
 
+    # keys are datetimes or categoricals, so groupby's own key sort already yields
+    # (time, compare) order; observed=True skips empty category combinations
     cols = [time_key] + ([compare_by] if compare_by else [])
-    g = (q.groupby(cols, dropna=False)[metric].sum(min_count=1).reset_index())
-    g = g.sort_values(by=[sort_col, compare_by] if compare_by else [sort_col])
+    g = (q.groupby(cols, dropna=False, observed=True, sort=True)[metric].sum(min_count=1).reset_index())
     return g, time_key
 
+@st.cache_data
+def cached_aggregate(_df: pd.DataFrame, data_key: str, filters_key: tuple, date_range, bounds,
+                     time_slice: str, compare_by: str, metric: str):
+    # _df is not hashed (data_key identifies it), so chart-only changes
+    # (chart type, Top N) are served from cache without re-filtering.
+    # Only the group keys and the metric are carried through the filter's row take,
+    # so filter + groupby touch just the columns the result needs.
+    cols = list(dict.fromkeys(c for c in [TIME_KEYS.get(time_slice, "Month"), compare_by, metric] if c))
+    q = filter_df(_df, dict(filters_key), date_range, bounds=bounds, columns=cols)
+    return aggregate(q, time_slice=time_slice, compare_by=compare_by, metric=metric)
+
 def make_fig(agg: pd.DataFrame, time_key: str, compare_by: str, metric: str, chart_type: str, top_n: int):
-    data = agg.copy()
+    data = agg  # only read here; the Top-N subset below is a new frame anyway
     if compare_by:
-        totals = data.groupby(compare_by, dropna=False)[metric].sum().reset_index()
-        keep = set(totals.sort_values(metric, ascending=False).head(top_n)[compare_by].astype(str))
-        data = data[data[compare_by].astype(str).isin(keep)]
+        # per-category totals from the already-reduced agg rows; nlargest avoids a full sort
+        totals = agg.groupby(compare_by, dropna=False, observed=True)[metric].sum()
+        keep = totals.nlargest(top_n).index
+        data = agg.loc[agg[compare_by].isin(keep)]
 
     title = f"{metric} by {time_key}" + (f" and {compare_by}" if compare_by else "")
     if chart_type == "Bar":
         fig = px.bar(data, x=time_key, y=metric, color=compare_by if compare_by else None, barmode="group", title=title)
     else:
-        fig = px.line(data, x=time_key, y=metric, color=compare_by if compare_by else None, markers=True, title=title)
+        fig = px.line(data, x=time_key, y=metric, color=compare_by if compare_by else None, markers=True, title=title,
+                      render_mode="webgl")  # WebGL traces stay responsive at large Top N
     fig.update_layout(xaxis_title=time_key, yaxis_title=metric, legend_title=compare_by or "Legend")
     return fig, data
 
 def to_csv_bytes(df: pd.DataFrame) -> bytes:
-    return df.to_csv(index=False).encode("utf-8")
+    # Arrow writes UTF-8 straight from its buffers (no per-cell Python str + encode pass)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # match DataFrame.to_csv output: midnight-only timestamps as plain dates, whole-second
+    # timestamps without fractional digits, booleans as True/False
+    for i, name in enumerate(table.column_names):
+        col = table.column(i)
+        if pa.types.is_timestamp(col.type):
+            for unit, target in (("day", pa.date32()), ("second", pa.timestamp("s", col.type.tz))):
+                if pc.all(pc.equal(pc.floor_temporal(col, unit=unit), col)).as_py() is not False:
+                    table = table.set_column(i, name, col.cast(target))
+                    break
+        elif pa.types.is_boolean(col.type):
+            table = table.set_column(i, name, pc.if_else(col, "True", "False"))
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(table, sink)
+    return sink.getvalue().to_pybytes()
 
 # ---------- Load data ----------
-default_path = "menu_mix_daily_enriched.csv"
-uploaded = st.sidebar.file_uploader("Upload CSV (optional; expects BusinessDate, ItemName, ItemsSold, NetRevenue...)", type=["csv"])
+default_path = "menu_mix_daily_enriched.parquet"
+if not os.path.exists(default_path):
+    default_path = "menu_mix_daily_enriched.csv"
+uploaded = st.sidebar.file_uploader("Upload CSV or Parquet (optional; expects BusinessDate, ItemName, ItemsSold, NetRevenue...)", type=["csv", "parquet"])
 df = load_data(uploaded if uploaded is not None else default_path)
+data_key = uploaded.file_id if uploaded is not None else default_path
 
 # ---------- Sidebar filters ----------
 st.sidebar.header("Filters")
-min_date = pd.to_datetime(df["BusinessDate"].min()).date()
-max_date = pd.to_datetime(df["BusinessDate"].max()).date()
+min_date, max_date = cached_date_bounds(df, data_key)
 date_range = st.sidebar.date_input("Date range", value=(min_date, max_date), min_value=min_date, max_value=max_date)
 
 def ms(col, label=None):
     if col in df.columns:
-        opts = sorted(df[col].dropna().unique(), key=lambda x: str(x))
-        return st.sidebar.multiselect(label or col, opts)
+        return st.sidebar.multiselect(label or col, cached_options(df, data_key, col))
     return []
 
 filters = {
@@ -142,7 +204,7 @@ top_n = st.sidebar.slider("Top N (comparison dimension)", 3, 50, 20, 1)
 chart_type = st.sidebar.radio("Chart type", ["Bar", "Line"], index=0)
 
 # ---------- Apply filters & KPIs ----------
-q = filter_df(df, filters, date_range)
+q = filter_df(df, filters, date_range, bounds=(min_date, max_date))
 kpi1 = float(q["NetRevenue"].sum()) if "NetRevenue" in q.columns else np.nan
 kpi2 = float(q["ItemsSold"].sum()) if "ItemsSold" in q.columns else np.nan
 kpi3 = float(q["AvgNetPrice"].mean()) if "AvgNetPrice" in q.columns else np.nan
@@ -155,7 +217,9 @@ c3.metric("Avg Net Price", f"${kpi3:,.2f}" if pd.notna(kpi3) else "N/A")
 st.markdown("---")
 
 # ---------- Aggregate + visualize ----------
-agg, time_key = aggregate(q, time_slice=time_slice, compare_by=compare_by, metric=metric)
+filters_key = tuple(sorted((k, tuple(v)) for k, v in filters.items()))
+agg, time_key = cached_aggregate(df, data_key, filters_key, tuple(date_range), (min_date, max_date),
+                                 time_slice=time_slice, compare_by=compare_by, metric=metric)
 fig, view = make_fig(agg, time_key=time_key, compare_by=compare_by, metric=metric, chart_type=chart_type, top_n=top_n)
 
 st.subheader("Visualization")